@@ -0,0 +1,638 @@
+"""Jira issue scraper for Apache projects (default: HADOOP).
+
+Fetches issues page by page from the Apache Jira REST API, pulls the
+comments for each issue, cleans the HTML into plain text and writes one
+JSON record per line. Progress is checkpointed so an interrupted run can
+be resumed without re-downloading everything.
+
+Usage:
+    python jira_scraper.py --project HADOOP --out hadoop.jsonl
+"""
+
+import argparse
+import asyncio
+import functools
+import io
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import ijson
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup
+from dateutil import parser as dateparser
+from selectolax.parser import HTMLParser
+from tqdm import tqdm
+
+try:
+    import httpx
+except ImportError:  # HTTP/2 support is optional
+    httpx = None
+
+try:
+    import aiohttp
+except ImportError:  # async mode is optional
+    aiohttp = None
+
+try:
+    import zstandard as zstd
+except ImportError:  # compressed output is optional
+    zstd = None
+
+JIRA_BASE = "https://issues.apache.org/jira/rest/api/2"
+DEFAULT_MAX_RESULTS = 1000
+DEFAULT_CONCURRENCY = 8
+CHECKPOINT_EVERY = 10  # pages between fsync+rename checkpoint writes
+RETRY_TOTAL = 6
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+EMPTY = {}  # shared sentinel for absent nested objects; never mutated
+SEARCH_FIELDS = "summary,description,project,reporter,assignee,status,priority,labels,created,updated,comment"
+
+
+def html_to_text(html):
+    """Convert Jira-rendered HTML into readable plain text."""
+    if not html:
+        return ""
+    try:
+        # selectolax wraps the Lexbor C parser; Jira's rendered HTML is
+        # small and simple, so this covers essentially everything.
+        return HTMLParser(html).text(separator="\n").strip()
+    except Exception:
+        return BeautifulSoup(html, "html.parser").get_text(separator="\n").strip()
+
+
+@functools.lru_cache(maxsize=65536)
+def safe_parse_date(value):
+    """Parse a Jira timestamp into ISO format, returning the input on failure.
+
+    Jira always emits ISO 8601 with a +0000 style offset, which (after
+    inserting the colon) datetime.fromisoformat handles in C; dateutil
+    is kept only as a fallback for anything unexpected. The cache skips
+    re-parsing the repeated timestamps Jira hands back across comments.
+    """
+    if not value:
+        return None
+    normalized = value
+    if len(value) >= 5 and value[-5] in "+-" and value[-4:].isdigit():
+        normalized = value[:-2] + ":" + value[-2:]
+    try:
+        return datetime.fromisoformat(normalized).isoformat()
+    except ValueError:
+        pass
+    try:
+        return dateparser.parse(value).isoformat()
+    except (ValueError, OverflowError):
+        return value
+
+
+HEADERS = {
+    "Accept": "application/json",
+    "User-Agent": "scalar-assignment-jira-scraper",
+}
+
+
+def make_session(http2=False):
+    """Build an HTTP client with keep-alive pooling and retries baked in.
+
+    The default is a requests Session: 429/5xx handling lives entirely
+    in urllib3's Retry, which parses Retry-After in both its
+    delta-seconds (including fractional) and HTTP-date forms — things
+    the old hand-rolled int() branch got wrong. With http2=True an
+    httpx.Client is returned instead, multiplexing all in-flight
+    requests over one TLS connection (httpx only retries connect
+    failures, so HTTP/2 stays opt-in).
+    """
+    if http2:
+        if httpx is None:
+            raise SystemExit("--http2 requires the httpx[http2] package")
+        transport = httpx.HTTPTransport(
+            http2=True, retries=6, limits=httpx.Limits(max_connections=32)
+        )
+        return httpx.Client(transport=transport, headers=HEADERS, timeout=30)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=1,
+        status_forcelist=RETRY_STATUSES,
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+
+def jira_get(session, url, params=None):
+    """GET a Jira endpoint and return the decoded JSON.
+
+    Retries, backoff and Retry-After handling live in the session's
+    urllib3 Retry config, so anything that reaches us is final.
+    """
+    r = session.get(url, params=params, timeout=30)
+    if r.status_code != 200:
+        tqdm.write(f"HTTP {r.status_code} from {url} after retries")
+        r.raise_for_status()
+    return orjson.loads(r.content)
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view over an iterator of byte chunks, for ijson."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buf = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf:
+            try:
+                self._buf = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+
+def search_page(session, url, params):
+    """Fetch one /search page streamed, returning (total, issue iterator).
+
+    Instead of materializing the whole page (up to 1000 issues of
+    description + comments) before touching the first record, the body
+    is parsed incrementally with ijson: Jira serializes total ahead of
+    the issues array, so we read events up to the array and hand back a
+    generator over the rest.
+    """
+    if httpx is not None and isinstance(session, httpx.Client):
+        r = session.send(session.build_request("GET", url, params=params), stream=True)
+    else:
+        r = session.get(url, params=params, stream=True, timeout=30)
+    if r.status_code != 200:
+        tqdm.write(f"HTTP {r.status_code} from {url} after retries")
+        r.raise_for_status()
+    if isinstance(r, requests.Response):
+        r.raw.decode_content = True
+        source = r.raw
+    else:
+        source = _ChunkReader(r.iter_bytes())
+    events = ijson.parse(source)
+    total = 0
+    for prefix, event, value in events:
+        if prefix == "total":
+            total = value
+        elif prefix == "issues" and event == "start_array":
+            break
+
+    def issues():
+        try:
+            yield from ijson.common.items(events, "issues.item")
+        finally:
+            r.close()
+
+    return total, issues()
+
+
+def comment_to_dict(c):
+    """Reduce a raw Jira comment to the fields we keep."""
+    return {
+        "id": c.get("id"),
+        "author": (c.get("author") or EMPTY).get("displayName"),
+        "created": safe_parse_date(c.get("created")),
+        "body": html_to_text(c.get("body")),
+    }
+
+
+def fetch_comments(session, issue_key, start_at=0):
+    """Fetch the comments on an issue starting at an offset, paginating."""
+    comments = []
+    while True:
+        data = jira_get(
+            session,
+            f"{JIRA_BASE}/issue/{issue_key}/comment",
+            {"startAt": start_at, "maxResults": 100},
+        )
+        batch = data.get("comments", [])
+        comments.extend(comment_to_dict(c) for c in batch)
+        start_at += len(batch)
+        if start_at >= data.get("total", 0) or not batch:
+            break
+    return comments
+
+
+def derive_prompts(record):
+    """Rebuild the LLM prompts for a record.
+
+    The prompts are pure functions of content, so consumers can call
+    this lazily instead of storing two more copies of every issue in
+    the JSONL.
+    """
+    content = record.get("content", "")
+    return {
+        "summary_prompt": f"Summarize the following Jira issue:\n\n{content}",
+        "qa_prompt": f"Write 3 question-answer pairs that help understand this issue:\n\n{content}",
+    }
+
+
+def issue_to_record(session, issue, emit_prompts=False):
+    """Flatten a raw Jira issue plus its comments into one output record."""
+    fields = issue.get("fields") or EMPTY
+    _get = fields.get
+    comment_field = _get("comment") or EMPTY
+    comments = [comment_to_dict(c) for c in comment_field.get("comments", ())]
+    # The search API caps inline comments; page in the rest only when truncated.
+    if comment_field.get("total", 0) > len(comments):
+        comments.extend(fetch_comments(session, issue.get("key"), start_at=len(comments)))
+    record = {
+        "id": issue.get("id"),
+        "key": issue.get("key"),
+        "title": _get("summary") or "",
+        "project": (_get("project") or EMPTY).get("key"),
+        "reporter": (_get("reporter") or EMPTY).get("displayName"),
+        "assignee": (_get("assignee") or EMPTY).get("displayName"),
+        "status": (_get("status") or EMPTY).get("name"),
+        "priority": (_get("priority") or EMPTY).get("name"),
+        "labels": _get("labels"),
+        "created": safe_parse_date(_get("created")),
+        "updated": safe_parse_date(_get("updated")),
+        "description": html_to_text(_get("description")),
+        "comments": comments,
+    }
+    # Compact the on-disk record: an absent key is cheaper than null or []
+    # repeated across a hundred thousand rows.
+    record = {k: v for k, v in record.items() if v is not None and v != []}
+    content = "\n\n".join(
+        (record["title"], record["description"], *(c["body"] for c in comments))
+    ).strip()
+    record["content"] = content
+    if emit_prompts:
+        record["derived"] = derive_prompts(record)
+    return record
+
+
+def open_output(out_path, compress=False):
+    """Open the JSONL output for appending, optionally as a zstd stream.
+
+    Compressed output lands in {out_path}.zst; zstd level 3 with
+    threaded compression shrinks JSON-ish text roughly 8x, which
+    matters once a project's dump reaches tens of GB. Either way the
+    handle takes bytes.
+    """
+    if not compress:
+        return open(out_path, "ab", buffering=1 << 20)
+    if zstd is None:
+        raise SystemExit("--compress requires the zstandard package")
+    if not out_path.endswith(".zst"):
+        out_path += ".zst"
+    cctx = zstd.ZstdCompressor(level=3, threads=-1)
+    return cctx.stream_writer(open(out_path, "ab"))
+
+
+def load_checkpoint(project):
+    """Return (startAt, processed keys) from the checkpoint files, if any.
+
+    Processed keys live in an append-only .keys log (one key per line);
+    the JSON file carries startAt plus the keys-log byte offset at the
+    last fsync. Keys past that offset may have outlived their record
+    (the key log's buffer is far smaller than the output's), so the
+    log is truncated back to the trusted offset here. A "processed"
+    list found in the JSON (the old format) is still honored on load.
+    """
+    data = {}
+    processed = set()
+    path = f"checkpoint-{project}.json"
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except ValueError:
+            tqdm.write(f"unreadable checkpoint {path}; starting from 0")
+    start_at = data.get("startAt", 0)
+    processed.update(data.get("processed", []))
+    keys_offset = data.get("keysOffset")
+    keys_path = f"checkpoint-{project}.keys"
+    if os.path.exists(keys_path):
+        with open(keys_path, "r+b") as f:
+            blob = f.read() if keys_offset is None else f.read(keys_offset)
+            if keys_offset is not None:
+                f.truncate(keys_offset)
+        processed.update(blob.decode("utf-8").split())
+    return start_at, processed
+
+
+def save_checkpoint(project, start_at, out_f=None, keys_f=None):
+    """Atomically persist scrape progress so a crash can be resumed.
+
+    Output and key-log handles are flushed and fsynced first (output
+    before keys, so a durable key always has a durable record behind
+    it) and the keys-log offset at this fsync is stored alongside
+    startAt — load_checkpoint refuses to trust keys past it.
+    """
+    state = {"startAt": start_at}
+    for f in (out_f, keys_f):
+        if f is not None:
+            f.flush()
+            os.fsync(f.fileno())
+    if keys_f is not None:
+        state["keysOffset"] = keys_f.tell()
+    path = f"checkpoint-{project}.json"
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        # Without this the rename can land an empty file on power loss.
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def scrape_project(project, out_path, jql=None, max_results=DEFAULT_MAX_RESULTS,
+                   concurrency=DEFAULT_CONCURRENCY, emit_prompts=False, http2=False,
+                   compress=False):
+    """Scrape every issue in a project into a JSONL file.
+
+    The first search page is fetched alone to learn the total (and any
+    server-side page cap); the remaining offsets are then fetched
+    concurrently on the session's connection pool. Raw issues flow
+    through a bounded queue to a writer thread that does the CPU work
+    (HTML-to-text, serialization) and the file writes, so parsing one
+    page overlaps with downloading the next.
+    """
+    session = make_session(http2=http2)
+    jql = jql or f"project = {project} ORDER BY created ASC"
+    start_at, processed = load_checkpoint(project)
+    search_url = f"{JIRA_BASE}/search"
+    # Empty expand keeps Jira from attaching renderedFields/changelog stubs.
+    base_params = {"jql": jql, "maxResults": max_results, "fields": SEARCH_FIELDS, "expand": ""}
+
+    with open_output(out_path, compress) as out_f, \
+            open(f"checkpoint-{project}.keys", "ab") as keys_f:
+
+        work = queue.Queue(maxsize=256)
+        writer_error = []
+        last_start_at = start_at
+
+        def writer():
+            nonlocal last_start_at
+            pages_done = 0
+            try:
+                while True:
+                    kind, payload = work.get()
+                    if kind == "done":
+                        return
+                    if kind == "checkpoint":
+                        last_start_at = payload
+                        pages_done += 1
+                        # An fsync+rename per page serializes the loop on the
+                        # disk; amortize it and settle up at shutdown instead.
+                        if pages_done % CHECKPOINT_EVERY == 0:
+                            save_checkpoint(project, payload, out_f, keys_f)
+                            # The durable checkpoint is now past anything a
+                            # crashed run could have written (its keys reach at
+                            # most CHECKPOINT_EVERY - 1 pages beyond its last
+                            # checkpoint), so membership tests can stop. The
+                            # JQL orders by created ASC, which never changes,
+                            # so this run can't repeat keys on its own.
+                            processed.clear()
+                        continue
+                    key = payload.get("key")
+                    if processed and key in processed:
+                        pbar.update(1)
+                        continue
+                    record = issue_to_record(session, payload, emit_prompts=emit_prompts)
+                    out_f.write(orjson.dumps(record) + b"\n")
+                    keys_f.write(key.encode() + b"\n")
+                    processed.add(key)
+                    pbar.update(1)
+            except BaseException as exc:
+                writer_error.append(exc)
+                # Keep draining so the producer never blocks on a full queue.
+                while work.get()[0] != "done":
+                    pass
+
+        def enqueue_page(issues):
+            nonlocal start_at
+            count = 0
+            for issue in issues:
+                work.put(("issue", issue))
+                count += 1
+            start_at += count
+            work.put(("checkpoint", start_at))
+            return count
+
+        total, first_issues = search_page(session, search_url, base_params | {"startAt": start_at})
+        pbar = tqdm(total=total, initial=start_at, unit="issue", desc=project)
+        writer_thread = threading.Thread(target=writer, name="writer", daemon=True)
+        writer_thread.start()
+        try:
+            got = enqueue_page(first_issues)
+            if got:
+                # Jira silently caps maxResults; match the cap so startAt stays aligned.
+                if got < max_results and start_at < total:
+                    tqdm.write(f"server capped page size at {got} (requested {max_results})")
+                    max_results = got
+                    base_params["maxResults"] = max_results
+                offsets = range(start_at, total, max_results)
+                if offsets:
+                    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+                        def fetch_page(s):
+                            _, issues = search_page(session, search_url, base_params | {"startAt": s})
+                            # Drain inside the worker so the streamed response
+                            # is closed before the task returns; otherwise
+                            # every remaining page can sit half-read waiting
+                            # for the main thread.
+                            return list(issues)
+
+                        # Submit offsets a window at a time so completed pages
+                        # never pile up faster than the writer consumes them.
+                        for i in range(0, len(offsets), concurrency):
+                            for page in executor.map(fetch_page, offsets[i:i + concurrency]):
+                                enqueue_page(page)
+        finally:
+            work.put(("done", None))
+            writer_thread.join()
+            # Always land a final checkpoint, whether we finished, hit an
+            # error, or were interrupted.
+            save_checkpoint(project, last_start_at, out_f, keys_f)
+        pbar.close()
+        if writer_error:
+            raise writer_error[0]
+
+
+async def scrape_project_async(project, out_path, jql=None, max_results=DEFAULT_MAX_RESULTS,
+                               concurrency=DEFAULT_CONCURRENCY, emit_prompts=False,
+                               compress=False):
+    """Async variant of scrape_project, exposed via --async.
+
+    aiohttp keeps every page fetch in flight on a single thread —
+    bounded by a semaphore rather than a worker pool — while the same
+    writer-thread pattern as the sync path drains a thread-safe queue.
+    Tasks are awaited in offset order so checkpoints stay contiguous.
+    The rare comment-overflow fallback inside issue_to_record still
+    goes through a small synchronous session on the writer thread.
+    """
+    if aiohttp is None:
+        raise SystemExit("--async requires the aiohttp package")
+    fallback_session = make_session()
+    jql = jql or f"project = {project} ORDER BY created ASC"
+    start_at, processed = load_checkpoint(project)
+    search_url = f"{JIRA_BASE}/search"
+    base_params = {"jql": jql, "maxResults": max_results, "fields": SEARCH_FIELDS, "expand": ""}
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+
+    with open_output(out_path, compress) as out_f, \
+            open(f"checkpoint-{project}.keys", "ab") as keys_f:
+
+        work = queue.Queue(maxsize=256)
+        writer_error = []
+        last_start_at = start_at
+
+        def writer():
+            nonlocal last_start_at
+            pages_done = 0
+            try:
+                while True:
+                    kind, payload = work.get()
+                    if kind == "done":
+                        return
+                    if kind == "checkpoint":
+                        last_start_at = payload
+                        pages_done += 1
+                        if pages_done % CHECKPOINT_EVERY == 0:
+                            save_checkpoint(project, payload, out_f, keys_f)
+                            # Same reasoning as the sync path: past the first
+                            # durable checkpoint no earlier key can reappear.
+                            processed.clear()
+                        continue
+                    key = payload.get("key")
+                    if processed and key in processed:
+                        pbar.update(1)
+                        continue
+                    record = issue_to_record(fallback_session, payload, emit_prompts=emit_prompts)
+                    out_f.write(orjson.dumps(record) + b"\n")
+                    keys_f.write(key.encode() + b"\n")
+                    processed.add(key)
+                    pbar.update(1)
+            except BaseException as exc:
+                writer_error.append(exc)
+                while work.get()[0] != "done":
+                    pass
+
+        def enqueue_page(issues):
+            nonlocal start_at
+            for issue in issues:
+                work.put(("issue", issue))
+            start_at += len(issues)
+            work.put(("checkpoint", start_at))
+            return len(issues)
+
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, ttl_dns_cache=600),
+            headers=HEADERS,
+            timeout=aiohttp.ClientTimeout(total=60),
+        ) as session:
+
+            async def fetch_page(offset):
+                # aiohttp has no equivalent of urllib3's Retry, so match the
+                # sync path's resilience by hand: exponential backoff on
+                # 429/5xx and connection errors, honoring Retry-After.
+                async with sem:
+                    for attempt in range(RETRY_TOTAL):
+                        retry_after = None
+                        try:
+                            async with session.get(
+                                search_url, params=base_params | {"startAt": offset}
+                            ) as r:
+                                if r.status == 200:
+                                    return orjson.loads(await r.read())
+                                tqdm.write(f"HTTP {r.status} from {search_url}")
+                                retry_after = r.headers.get("Retry-After")
+                                if r.status not in RETRY_STATUSES:
+                                    r.raise_for_status()
+                        except aiohttp.ClientResponseError:
+                            raise  # non-retryable status from just above
+                        except aiohttp.ClientError:
+                            pass  # connection-level failure; back off and retry
+                        delay = 2 ** attempt
+                        if retry_after:
+                            try:
+                                delay = max(delay, float(retry_after))
+                            except ValueError:
+                                pass
+                        await asyncio.sleep(delay)
+                    raise RuntimeError(
+                        f"giving up on {search_url} startAt={offset} after {RETRY_TOTAL} attempts"
+                    )
+
+            data = await fetch_page(start_at)
+            total = data.get("total", 0)
+            pbar = tqdm(total=total, initial=start_at, unit="issue", desc=project)
+            writer_thread = threading.Thread(target=writer, name="writer", daemon=True)
+            writer_thread.start()
+            try:
+                got = await loop.run_in_executor(None, enqueue_page, data.get("issues", []))
+                if got:
+                    if got < max_results and start_at < total:
+                        tqdm.write(f"server capped page size at {got} (requested {max_results})")
+                        max_results = got
+                        base_params["maxResults"] = max_results
+                    tasks = [asyncio.create_task(fetch_page(o))
+                             for o in range(start_at, total, max_results)]
+                    for task in tasks:
+                        page = await task
+                        await loop.run_in_executor(None, enqueue_page, page.get("issues", []))
+            finally:
+                work.put(("done", None))
+                await loop.run_in_executor(None, writer_thread.join)
+                save_checkpoint(project, last_start_at, out_f, keys_f)
+            pbar.close()
+            if writer_error:
+                raise writer_error[0]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scrape Jira issues into JSONL")
+    ap.add_argument("--project", default="HADOOP", help="Jira project key")
+    ap.add_argument("--out", default=None, help="output JSONL path")
+    ap.add_argument("--jql", default=None, help="override the JQL query")
+    ap.add_argument("--batch-size", type=int, default=DEFAULT_MAX_RESULTS,
+                    help="issues per search request (server may cap this)")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                    help="number of search pages fetched in parallel")
+    ap.add_argument("--emit-prompts", action="store_true",
+                    help="store the derived prompts in each record (triples file size)")
+    ap.add_argument("--http2", action="store_true",
+                    help="use httpx with HTTP/2 multiplexing instead of requests")
+    ap.add_argument("--async", dest="use_async", action="store_true",
+                    help="fetch with asyncio + aiohttp instead of threads (HTTP/1.1)")
+    ap.add_argument("--compress", action="store_true",
+                    help="write a zstd-compressed stream ({out}.zst)")
+    args = ap.parse_args()
+    # Turn SIGTERM into SystemExit so scrape_project's finally block still
+    # writes the final checkpoint when the process is killed politely.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+    out_path = args.out or f"{args.project.lower()}.jsonl"
+    if args.use_async:
+        asyncio.run(scrape_project_async(
+            args.project, out_path, jql=args.jql, max_results=args.batch_size,
+            concurrency=args.concurrency, emit_prompts=args.emit_prompts,
+            compress=args.compress))
+    else:
+        scrape_project(args.project, out_path, jql=args.jql, max_results=args.batch_size,
+                       concurrency=args.concurrency, emit_prompts=args.emit_prompts,
+                       http2=args.http2, compress=args.compress)
+
+
+if __name__ == "__main__":
+    main()